@@ -8,45 +8,120 @@ Usage:
 
 import argparse
 import csv
+import hashlib
+import os
+import pickle
+import tempfile
 from pathlib import Path
-from typing import Optional, List, Dict
+from typing import Optional, Dict, Tuple
 
 CSV_PATH = Path(__file__).resolve().parent.parent / "public" / "property_estimates_au.csv"
+# Kept out of public/ so the build never publishes it
+CACHE_DIR = Path(__file__).resolve().parent / ".cache"
 
 
-def load_rows(path: Path) -> List[Dict[str, str]]:
-    with path.open(newline="") as f:
-        return list(csv.DictReader(f))
+# Index keys, tightest to loosest:
+#   (city, bedrooms, bathrooms, has_garage)  exact match
+#   (city, bedrooms, bathrooms)              ignore garage
+#   (city, bedrooms)                         ignore garage/bathroom
+#   (city,)                                  city only
+EstimateIndex = Dict[Tuple, int]
 
 
 def normalize_city(city: str) -> str:
     return city.strip().upper()
 
 
-def find_estimate(city: str, bedrooms: int, bathrooms: int, garage: bool, rows: List[Dict[str, str]]) -> Optional[int]:
+def parse_rows(path: Path) -> EstimateIndex:
+    """
+    Parse the CSV once into a lookup index covering every fallback tier.
+    The first row seen for a key wins, matching the original row-order scan.
+    """
+    index: EstimateIndex = {}
+    with path.open(newline="") as f:
+        for row in csv.DictReader(f):
+            city = normalize_city(row["city"])
+            beds = int(row["bedrooms"])
+            baths = int(row["bathrooms"])
+            garage = row["has_garage"] == "1"
+            price = int(row["estimated_price_aud"])
+            for key in (
+                (city, beds, baths, garage),
+                (city, beds, baths),
+                (city, beds),
+                (city,),
+            ):
+                index.setdefault(key, price)
+    return index
+
+
+def cache_path_for(path: Path) -> Path:
+    # One file per CSV location, so different --csv inputs never share a cache
+    digest = hashlib.blake2b(str(path.resolve()).encode(), digest_size=8).hexdigest()
+    return CACHE_DIR / f"{path.stem}-{digest}.pkl"
+
+
+def load_cached_index(path: Path) -> Optional[EstimateIndex]:
+    """Return the pickled index for the CSV if it is at least as new as the CSV."""
+    cache_path = cache_path_for(path)
+    try:
+        if cache_path.stat().st_mtime < path.stat().st_mtime:
+            return None
+        with cache_path.open("rb") as f:
+            index = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError,
+            AttributeError, ImportError, IndexError, TypeError):
+        # Missing, truncated or incompatible cache: rebuild from the CSV
+        return None
+    return index if isinstance(index, dict) else None
+
+
+def save_cached_index(path: Path, index: EstimateIndex) -> None:
+    """Atomically write the index to the cache dir; an unwritable location is not an error."""
+    cache_path = cache_path_for(path)
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=cache_path.parent, prefix=cache_path.name, suffix=".tmp")
+    except OSError:
+        return
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+        # mkstemp creates 0600; the index is public data, readable by everyone
+        os.chmod(tmp_name, 0o644)
+        os.replace(tmp_name, cache_path)
+    except OSError:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+
+
+def load_rows(path: Path) -> EstimateIndex:
+    """
+    Load the lookup index covering every fallback tier, reusing the pickled
+    copy when the CSV has not changed since it was built.
+    """
+    index = load_cached_index(path)
+    if index is None:
+        index = parse_rows(path)
+        save_cached_index(path, index)
+    return index
+
+
+def find_estimate(city: str, bedrooms: int, bathrooms: int, garage: bool, index: EstimateIndex) -> Optional[int]:
     city_key = normalize_city(city)
 
-    def matches(row, require_garage: bool, require_beds: bool, require_baths: bool) -> bool:
-        if normalize_city(row["city"]) != city_key:
-            return False
-        if require_beds and int(row["bedrooms"]) != bedrooms:
-            return False
-        if require_baths and int(row["bathrooms"]) != bathrooms:
-            return False
-        if require_garage and ((row["has_garage"] == "1") != garage):
-            return False
-        return True
-
     # Best to weakest match
-    for req_g, req_b, req_ba in [
-        (True, True, True),   # exact match
-        (False, True, True),  # ignore garage
-        (False, True, False), # ignore garage/bathroom
-        (False, False, False) # city only
+    for key in [
+        (city_key, bedrooms, bathrooms, garage),  # exact match
+        (city_key, bedrooms, bathrooms),          # ignore garage
+        (city_key, bedrooms),                     # ignore garage/bathroom
+        (city_key,),                              # city only
     ]:
-        for row in rows:
-            if matches(row, req_g, req_b, req_ba):
-                return int(row["estimated_price_aud"])
+        estimate = index.get(key)
+        if estimate is not None:
+            return estimate
     return None
 
 
@@ -60,8 +135,8 @@ def main() -> None:
     args = parser.parse_args()
 
     has_garage = args.garage.lower() in {"yes", "true", "1"}
-    rows = load_rows(args.csv)
-    estimate = find_estimate(args.city, args.bedrooms, args.bathrooms, has_garage, rows)
+    index = load_rows(args.csv)
+    estimate = find_estimate(args.city, args.bedrooms, args.bathrooms, has_garage, index)
 
     if estimate is None:
         print("No estimate found for the provided inputs.")
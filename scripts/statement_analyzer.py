@@ -1,18 +1,41 @@
 import argparse
+import csv
+import hashlib
 import json
+import os
 import re
 import sys
+import tempfile
+import time
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List, Optional
 
+import numpy as np
 import pandas as pd
 
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:  # pyarrow is optional; fall back to pandas' CSV reader
+    pa = None
+    pa_csv = None
+
 # ---------- CONFIG ----------
 
 RECURRING_MIN_MONTHS = 2
 RECURRING_MIN_TX = 2
 AMOUNT_ROUND_DECIMALS = 0  # group recurring charges by rounded dollar amount
 LEAKAGE_TOP_N = 10         # how many lifestyle hotspots to surface
+CHUNKED_READ_MIN_BYTES = 64 * 1024 * 1024  # stream statements larger than this
+READ_CHUNK_ROWS = 100_000                  # rows per chunk when streaming
+
+# Optional on-disk memo of finished analyses, keyed by input content. Off
+# unless a cache dir is given (--cache-dir or STATEMENT_ANALYZER_CACHE_DIR):
+# results contain personal financial data, so entries expire and are capped.
+CACHE_DIR_ENV = "STATEMENT_ANALYZER_CACHE_DIR"
+CACHE_TTL_SECONDS = 60 * 60       # entries older than this are ignored and removed
+CACHE_MAX_ENTRIES = 64            # oldest entries beyond this are removed
+HASH_BLOCK_BYTES = 1024 * 1024    # read size when hashing input files
 
 # Micro categories -> macro buckets
 MACRO_CATEGORY_MAP = {
@@ -35,49 +58,79 @@ MACRO_CATEGORY_MAP = {
     "Side gig / Misc": "Income",
 }
 
+# Expense micro categories by merchant keyword, checked in priority order
+# (the first category with a keyword contained in the merchant wins).
+CATEGORY_KEYWORDS = [
+    ("Rent", ["RENT", "REALESTATE", "REALTY"]),
+    ("Rego", ["REGISTRATION", " REGO", "TRANSPORT DEPT"]),
+    ("Insurance", ["INSURANCE", "NRMA", "AAMI", "ALLIANZ"]),
+    ("Utilities", ["ENERGY", "POWER", "AGL", "ELECTRICITY", "WATER", "GAS"]),
+    ("Phone & Internet", ["OPTUS", "TELSTRA", "VODAFONE", "AMAYSIM"]),
+    ("Transport", ["UBER", "TRANSLINK", "GO CARD"]),
+    ("Groceries", ["COLES", "WOOLWORTHS", "ALDI", "IGA", "GROCER"]),
+    ("Eating Out", ["MCDONALDS", "SUSHI", "CAFE", "BUTCHER"]),
+    ("Subscriptions", ["NETFLIX", "SPOTIFY", "APPLECOMBILL", "CHATGPT", "AMZNPRIME"]),
+    ("Parking", ["PARKING", "WESTFIELD", "SHOPPING"]),
+]
+
+# Precompiled keyword alternation per category, in the same priority order
+CATEGORY_PATTERNS = [
+    (category, re.compile("|".join(re.escape(k) for k in keywords)))
+    for category, keywords in CATEGORY_KEYWORDS
+]
+
+# Common bank export date layouts (day-first), detected from a sample value
+DATE_FORMATS = [
+    (re.compile(r"\d{1,2}/\d{1,2}/\d{4}"), "%d/%m/%Y"),
+    (re.compile(r"\d{1,2}/\d{1,2}/\d{2}"), "%d/%m/%y"),
+    (re.compile(r"\d{1,2}-\d{1,2}-\d{4}"), "%d-%m-%Y"),
+    (re.compile(r"\d{4}-\d{2}-\d{2}"), "%Y-%m-%d"),
+    (re.compile(r"\d{1,2} [A-Za-z]{3} \d{4}"), "%d %b %Y"),
+    (re.compile(r"\d{1,2}-[A-Za-z]{3}-\d{4}"), "%d-%b-%Y"),
+]
+
 
 # ---------- HELPERS ----------
 
-def normalise_merchant(desc: str) -> str:
-    """Normalise merchant/description for grouping."""
-    if not isinstance(desc, str):
-        return "UNKNOWN"
-    s = desc.upper()
-    s = re.sub(r"[^A-Z0-9 ]+", "", s)  # remove punctuation
-    s = re.sub(r"\s+", " ", s).strip()
-    return s or "UNKNOWN"
+def normalise_merchants(desc: pd.Series) -> pd.Series:
+    """
+    Normalise merchant/description column for grouping.
+    Missing or blank descriptions become 'UNKNOWN':
+
+    >>> normalise_merchants(pd.Series(["Coles 4432, Taigum", None, " -- "])).tolist()
+    ['COLES 4432 TAIGUM', 'UNKNOWN', 'UNKNOWN']
+    """
+    s = desc.astype(str).str.upper()
+    s = s.str.replace(r"[^A-Z0-9 ]+", "", regex=True)  # remove punctuation
+    s = s.str.replace(r"\s+", " ", regex=True).str.strip()
+    # astype(str) keeps NaN on pandas 3, so missing values need their own check
+    return s.where(desc.notna() & s.ne(""), "UNKNOWN")
 
 
-def infer_category(merchant: str) -> str:
+def infer_categories(merchants: pd.Series) -> pd.Series:
     """
     Micro category for expenses based on merchant keywords.
     This is *expense-side* only (income is handled separately).
+    Categorical input is classified once per distinct merchant.
     """
-    merchant = merchant.upper()
-
-    # Hard categories
-    if any(x in merchant for x in ["RENT", "REALESTATE", "REALTY"]):
-        return "Rent"
-    if any(x in merchant for x in ["REGISTRATION", " REGO", "TRANSPORT DEPT"]):
-        return "Rego"
-    if any(x in merchant for x in ["INSURANCE", "NRMA", "AAMI", "ALLIANZ"]):
-        return "Insurance"
-    if any(x in merchant for x in ["ENERGY", "POWER", "AGL", "ELECTRICITY", "WATER", "GAS"]):
-        return "Utilities"
-    if any(x in merchant for x in ["OPTUS", "TELSTRA", "VODAFONE", "AMAYSIM"]):
-        return "Phone & Internet"
-    if any(x in merchant for x in ["UBER", "TRANSLINK", "GO CARD"]):
-        return "Transport"
-    if any(x in merchant for x in ["COLES", "WOOLWORTHS", "ALDI", "IGA", "GROCER"]):
-        return "Groceries"
-    if any(x in merchant for x in ["MCDONALDS", "SUSHI", "CAFE", "BUTCHER"]):
-        return "Eating Out"
-    if any(x in merchant for x in ["NETFLIX", "SPOTIFY", "APPLECOMBILL", "CHATGPT", "AMZNPRIME"]):
-        return "Subscriptions"
-    if any(x in merchant for x in ["PARKING", "WESTFIELD", "SHOPPING"]):
-        return "Parking"
-
-    return "Unknown"
+    if isinstance(merchants.dtype, pd.CategoricalDtype):
+        labels = infer_categories(pd.Series(merchants.cat.categories)).to_numpy()
+        # Missing merchants have code -1, which must not wrap to the last label
+        labels = np.append(labels, "Unknown")
+        return pd.Series(
+            labels[merchants.cat.codes.to_numpy()],
+            index=merchants.index,
+            dtype="category",
+        )
+
+    merchants = merchants.astype(str).str.upper()
+    conditions = [merchants.str.contains(pattern) for _, pattern in CATEGORY_PATTERNS]
+    choices = [category for category, _ in CATEGORY_PATTERNS]
+    return pd.Series(
+        np.select(conditions, choices, default="Unknown"),
+        index=merchants.index,
+        dtype=object,
+    )
 
 
 def clean_money_series(s: pd.Series) -> pd.Series:
@@ -92,7 +145,7 @@ def clean_money_series(s: pd.Series) -> pd.Series:
     )
 
     # Mark negatives given as parentheses: (123.45) -> -123.45
-    negative_mask = s.str.contains(r"\(") & s.str.contains(r"\)")
+    negative_mask = s.str.contains("(", regex=False) & s.str.contains(")", regex=False)
 
     # Remove everything except digits, dot, minus
     s = s.str.replace(r"[^\d\.\-]", "", regex=True)
@@ -102,91 +155,84 @@ def clean_money_series(s: pd.Series) -> pd.Series:
     return s
 
 
-def is_internal_transfer(merchant_norm: str) -> bool:
+def parse_dates(s: pd.Series) -> pd.Series:
     """
-    Detect internal account transfers that should NOT be treated as
-    income or spending (just moving money between own accounts).
-
-    For this app, anything with 'TRANSFER' in the normalised merchant
-    is treated as internal.
+    Parse a date column, using an explicit format detected from the first
+    value where possible. Values that don't fit it fall back to inference.
     """
-    if not isinstance(merchant_norm, str):
-        return False
-    m = merchant_norm.upper()
-    return "TRANSFER" in m
+    sample = s.dropna().astype(str).str.strip()
+    fmt = None
+    if not sample.empty:
+        for pattern, candidate in DATE_FORMATS:
+            if pattern.fullmatch(sample.iloc[0]):
+                fmt = candidate
+                break
 
+    if fmt is None:
+        return pd.to_datetime(s, dayfirst=True, errors="coerce")
 
-def standardise_statement_df(df: pd.DataFrame, source_name: str) -> pd.DataFrame:
-    """
-    Normalise a raw bank CSV into:
-      - date (datetime)
-      - description (str)
-      - amount (float, +ve inflow, -ve outflow)
+    parsed = pd.to_datetime(s, format=fmt, errors="coerce")
+    failed = parsed.isna() & s.notna()
+    if failed.any():
+        parsed[failed] = pd.to_datetime(s[failed], dayfirst=True, errors="coerce")
+    return parsed
 
-    Supports:
-      - Single 'Amount' column (optionally with DR/CR indicator)
-      - Separate 'Debit' and 'Credit' columns
-      - Flexible header names / casing.
+
+def detect_statement_columns(columns: List[str], source_name: str) -> Dict[str, Optional[str]]:
     """
-    cols_lower = {c.lower(): c for c in df.columns}
+    Work out which raw bank CSV columns hold the date, description and amount.
 
+    Returns a dict with keys 'date', 'description', 'amount', 'indicator',
+    'debit' and 'credit'. Either 'amount' or at least one of 'debit'/'credit'
+    is set; unused entries are None.
+    """
     # --------- 1. DATE column detection ---------
     date_col = None
-    for c in df.columns:
+    for c in columns:
         cl = c.lower()
         if "date" in cl:
             date_col = c
             break
     if date_col is None:
         raise KeyError(
-            f"[{source_name}] Could not find a date column. Columns were: {list(df.columns)}"
+            f"[{source_name}] Could not find a date column. Columns were: {list(columns)}"
         )
 
     # --------- 2. DESCRIPTION column detection ---------
     desc_col = None
-    for c in df.columns:
+    for c in columns:
         cl = c.lower()
         if any(k in cl for k in ["description", "details", "narration", "memo", "payee", "merchant", "reference"]):
             desc_col = c
             break
     if desc_col is None:
         # Fallback: first non-date column
-        for c in df.columns:
+        for c in columns:
             if c != date_col:
                 desc_col = c
                 break
 
-    # --------- 3. AMOUNT logic ---------
-    amount_series = None
+    # --------- 3. AMOUNT column detection ---------
 
     # Case A: single 'amount' type column
-    amount_like_cols = [c for c in df.columns if "amount" in c.lower()]
+    amount_like_cols = [c for c in columns if "amount" in c.lower()]
     indicator_col = None
-    for c in df.columns:
+    for c in columns:
         cl = c.lower()
         if any(k in cl for k in ["dr/cr", "debit/credit", "dc flag", "credit/debit", "cr/dr"]):
             indicator_col = c
             break
 
+    amt_col = None
+    debit_col = None
+    credit_col = None
     if amount_like_cols:
         # Use first amount-like column
         amt_col = amount_like_cols[0]
-        amount_series = clean_money_series(df[amt_col])
-
-        # If there's a separate indicator column, adjust sign accordingly
-        if indicator_col is not None:
-            ind = df[indicator_col].astype(str).str.upper().str.strip()
-            # 'DR' = debit (negative), 'CR' = credit (positive)
-            debit_mask = ind.str.contains("DR")
-            credit_mask = ind.str.contains("CR")
-            amount_series[debit_mask] = -amount_series[debit_mask].abs()
-            amount_series[credit_mask] = amount_series[credit_mask].abs()
-
     else:
         # Case B: separate Debit / Credit columns
-        debit_col = None
-        credit_col = None
-        for c in df.columns:
+        indicator_col = None
+        for c in columns:
             cl = c.lower()
             if "debit" in cl or "withdrawal" in cl:
                 debit_col = c
@@ -196,32 +242,116 @@ def standardise_statement_df(df: pd.DataFrame, source_name: str) -> pd.DataFrame
         if debit_col is None and credit_col is None:
             raise KeyError(
                 f"[{source_name}] Could not find amount, debit, or credit columns. "
-                f"Columns were: {list(df.columns)}"
+                f"Columns were: {list(columns)}"
             )
 
-        debit_vals = clean_money_series(df[debit_col]) if debit_col else 0.0
-        credit_vals = clean_money_series(df[credit_col]) if credit_col else 0.0
+    return {
+        "date": date_col,
+        "description": desc_col,
+        "amount": amt_col,
+        "indicator": indicator_col,
+        "debit": debit_col,
+        "credit": credit_col,
+    }
+
+
+def standardise_statement_df(df: pd.DataFrame, source_name: str) -> pd.DataFrame:
+    """
+    Normalise a raw bank CSV into:
+      - date (datetime)
+      - description (str)
+      - amount (float, +ve inflow, -ve outflow)
+
+    Supports:
+      - Single 'Amount' column (optionally with DR/CR indicator)
+      - Separate 'Debit' and 'Credit' columns
+      - Flexible header names / casing.
+    """
+    cols = detect_statement_columns(list(df.columns), source_name)
+
+    # --------- AMOUNT logic ---------
+    if cols["amount"] is not None:
+        amount_series = clean_money_series(df[cols["amount"]])
+
+        # If there's a separate indicator column, adjust sign accordingly
+        if cols["indicator"] is not None:
+            ind = df[cols["indicator"]].astype(str).str.upper().str.strip()
+            # 'DR' = debit (negative), 'CR' = credit (positive)
+            debit_mask = ind.str.contains("DR")
+            credit_mask = ind.str.contains("CR")
+            amount_series[debit_mask] = -amount_series[debit_mask].abs()
+            amount_series[credit_mask] = amount_series[credit_mask].abs()
+
+    else:
+        debit_vals = clean_money_series(df[cols["debit"]]) if cols["debit"] else 0.0
+        credit_vals = clean_money_series(df[cols["credit"]]) if cols["credit"] else 0.0
         amount_series = credit_vals - debit_vals  # inflow − outflow
 
-    # --------- 4. Build standardised DataFrame ---------
+    # --------- Build standardised DataFrame ---------
     out = pd.DataFrame()
-    out["date"] = pd.to_datetime(df[date_col], dayfirst=True, errors="coerce")
-    out["description"] = df[desc_col].astype(str)
+    out["date"] = parse_dates(df[cols["date"]])
+    out["description"] = df[cols["description"]].astype(str)
     out["amount"] = amount_series
 
     # Drop rows with no valid date
-    out = out[out["date"].notna()].copy()
+    out = out[out["date"].notna()]
 
     return out
 
 
 # ---------- CORE PIPELINE ----------
 
+def _read_header(csv_path: Path) -> List[str]:
+    with csv_path.open(newline="", encoding="utf-8-sig") as f:
+        return next(csv.reader(f), [])
+
+
+def _read_statement_columns(csv_path: Path, usecols: List[str]) -> pd.DataFrame:
+    """Read only the given columns, as strings, preferring Arrow's CSV reader."""
+    if pa_csv is None:
+        return pd.read_csv(csv_path, usecols=usecols, dtype=str)
+
+    try:
+        table = pa_csv.read_csv(
+            csv_path,
+            read_options=pa_csv.ReadOptions(use_threads=True),
+            convert_options=pa_csv.ConvertOptions(
+                include_columns=usecols,
+                column_types={c: pa.string() for c in usecols},
+                strings_can_be_null=True,
+            ),
+        )
+    except pa.ArrowInvalid:
+        # Arrow rejects ragged rows (trailing commas, short rows); pandas copes
+        return pd.read_csv(csv_path, usecols=usecols, dtype=str)
+    return table.to_pandas()
+
+
+def _projected_columns(csv_path: Path) -> List[str]:
+    """Detect the statement columns from the header alone, in file order."""
+    header = _read_header(csv_path)
+    cols = detect_statement_columns(header, str(csv_path))
+
+    # Keep file order so column detection on the projected frame is unchanged
+    wanted = {c for c in cols.values() if c is not None}
+    return [c for c in dict.fromkeys(header) if c in wanted]
+
+
 def _load_and_standardise(csv_path: Path) -> pd.DataFrame:
-    raw = pd.read_csv(csv_path)
+    raw = _read_statement_columns(csv_path, _projected_columns(csv_path))
     return standardise_statement_df(raw, source_name=str(csv_path))
 
 
+def _load_and_standardise_chunked(csv_path: Path, chunksize: int = READ_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Stream a large CSV and standardise it chunk by chunk, so peak memory
+    follows the chunk size rather than the file size.
+    """
+    usecols = _projected_columns(csv_path)
+    for chunk in pd.read_csv(csv_path, usecols=usecols, dtype=str, chunksize=chunksize):
+        yield standardise_statement_df(chunk, source_name=str(csv_path))
+
+
 def load_statements_from_files(files: List[str]) -> pd.DataFrame:
     """
     Load the provided CSV files (expects exactly 3) and combine them.
@@ -235,17 +365,20 @@ def load_statements_from_files(files: List[str]) -> pd.DataFrame:
         path = Path(file_path)
         if not path.exists():
             raise FileNotFoundError(f"CSV not found: {file_path}")
-        norm = _load_and_standardise(path)
-        dfs.append(norm)
+        if path.stat().st_size >= CHUNKED_READ_MIN_BYTES:
+            dfs.extend(_load_and_standardise_chunked(path))
+        else:
+            dfs.append(_load_and_standardise(path))
 
     data = pd.concat(dfs, ignore_index=True)
 
     # Derived fields used by the rest of the pipeline
     data["month_key"] = data["date"].dt.to_period("M").astype(str)
-    data["is_inflow"] = data["amount"] > 0
-    data["is_outflow"] = data["amount"] < 0
-    data["abs_amount"] = data["amount"].abs()
-    data["merchant_norm"] = data["description"].apply(normalise_merchant)
+    data["month_code"] = data["date"].dt.year * 12 + data["date"].dt.month  # int twin of month_key
+    # Internal account transfers (anything mentioning 'transfer') are just money
+    # moving between own accounts, not income or spending.
+    data["is_internal"] = data["description"].str.contains("transfer", case=False, regex=False, na=False)
+    data["merchant_norm"] = normalise_merchants(data["description"]).astype("category")
     data["day"] = data["date"].dt.day
 
     return data
@@ -254,70 +387,123 @@ def load_statements_from_files(files: List[str]) -> pd.DataFrame:
 def compute_monthly_summary(data: pd.DataFrame) -> Dict[str, Any]:
     """Compute per-month inflow, outflow, savings, and averages."""
     # Exclude internal transfers from cashflow stats
-    mask_internal = data["merchant_norm"].apply(is_internal_transfer)
-
-    inflows = (
-        data[data["is_inflow"] & ~mask_internal]
-        .groupby("month_key")["amount"]
-        .sum()
-        .rename("total_inflow")
-    )
-
-    outflows = (
-        data[data["is_outflow"] & ~mask_internal]
-        .groupby("month_key")["abs_amount"]
-        .sum()
-        .rename("total_outflow")
+    amount = data["amount"]
+    external = ~data["is_internal"]
+    inflow_mask = (amount > 0) & external
+    outflow_mask = (amount < 0) & external
+
+    monthly = (
+        data.assign(
+            total_inflow=amount.where(inflow_mask, 0.0),
+            total_outflow=(-amount).where(outflow_mask, 0.0),
+            flow_count=inflow_mask | outflow_mask,
+        )
+        .groupby("month_key")
+        .agg(
+            total_inflow=("total_inflow", "sum"),
+            total_outflow=("total_outflow", "sum"),
+            flow_count=("flow_count", "sum"),
+            tx_count=("amount", "count"),
+        )
     )
-
-    monthly = pd.concat([inflows, outflows], axis=1).fillna(0)
-    monthly["savings"] = monthly["total_inflow"] - monthly["total_outflow"]
+    # Only months with external cashflow are reported
+    monthly = monthly[monthly["flow_count"] > 0]
+    monthly = monthly[["total_inflow", "total_outflow", "tx_count"]]
+    monthly.insert(2, "savings", monthly["total_inflow"] - monthly["total_outflow"])
 
     avg_monthly_savings = monthly["savings"].mean()
     avg_monthly_spend = monthly["total_outflow"].mean()
 
-    tx_counts = data.groupby("month_key")["amount"].count().rename("tx_count")
-    monthly = monthly.join(tx_counts)
+    monthly_breakdown = [
+        {
+            "month_key": month_key,
+            "total_inflow": total_inflow,
+            "total_outflow": total_outflow,
+            "savings": savings,
+            "tx_count": tx_count,
+        }
+        for month_key, total_inflow, total_outflow, savings, tx_count in zip(
+            monthly.index.tolist(),
+            monthly["total_inflow"].tolist(),
+            monthly["total_outflow"].tolist(),
+            monthly["savings"].tolist(),
+            monthly["tx_count"].tolist(),
+        )
+    ]
 
     return {
-        "monthly_breakdown": monthly.reset_index().to_dict(orient="records"),
+        "monthly_breakdown": monthly_breakdown,
         "average_monthly_savings": float(avg_monthly_savings),
         "average_monthly_spend": float(avg_monthly_spend),
     }
 
 
-def detect_recurring_expenses(data: pd.DataFrame) -> List[Dict[str, Any]]:
-    """Find recurring expenses by merchant + approx amount."""
-    outflows = data[data["is_outflow"]].copy()
-    if outflows.empty:
-        return []
+def select_expense_outflows(data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Outflows that count as spending (internal transfers removed), with just
+    the columns the expense analyses use. Shared by recurring detection and
+    the expense summary.
+    """
+    amount = data["amount"]
+    mask = (amount < 0) & ~data["is_internal"]
+    outflows = data.loc[mask, ["merchant_norm", "month_code", "day"]]
+    return outflows.assign(abs_amount=amount[mask].abs())
 
-    # Remove internal transfers from recurring expense detection
-    outflows = outflows[~outflows["merchant_norm"].apply(is_internal_transfer)]
 
-    outflows["rounded_amount"] = outflows["abs_amount"].round(AMOUNT_ROUND_DECIMALS)
+def detect_recurring_expenses(outflows: pd.DataFrame) -> List[Dict[str, Any]]:
+    """
+    Find recurring expenses by merchant + approx amount.
+    Expects the external outflows from select_expense_outflows.
+    """
+    if outflows.empty:
+        return []
 
-    grouped = (
-        outflows
-        .groupby(["merchant_norm", "rounded_amount"])
-        .agg(
-            tx_count=("amount", "count"),
-            month_count=("month_key", pd.Series.nunique),
-            avg_amount=("abs_amount", "mean"),
-            avg_day=("day", "mean"),
-        )
-        .reset_index()
+    # Encode each (merchant, rounded amount) pair as one int64 key from two
+    # dense codes: merchant code * number of distinct amounts + amount code.
+    # Both codes are bounded by the row count, so the key cannot overflow
+    # however large the amounts themselves are.
+    merchants = outflows["merchant_norm"].astype("category")
+    if merchants.isna().any():
+        # A missing merchant has code -1, which would key into another merchant
+        merchants = merchants.astype(object).fillna("UNKNOWN").astype("category")
+    merchant_codes = merchants.cat.codes.to_numpy(dtype=np.int64)
+    abs_amounts = outflows["abs_amount"].to_numpy(dtype=np.float64)
+    amount_codes, amount_values = pd.factorize(
+        outflows["abs_amount"].round(AMOUNT_ROUND_DECIMALS), sort=True
     )
-
-    recurring = grouped[
-        (grouped["month_count"] >= RECURRING_MIN_MONTHS)
-        & (grouped["tx_count"] >= RECURRING_MIN_TX)
-    ].copy()
+    amount_span = len(amount_values)
+    keys = merchant_codes * amount_span + amount_codes.astype(np.int64)
+
+    # Sorted unique keys keep the (merchant, amount) ordering of a groupby
+    group_keys, group_ids, tx_count = np.unique(keys, return_inverse=True, return_counts=True)
+    group_ids = group_ids.ravel()
+    n_groups = len(group_keys)
+    # Means go through groupby so they keep pandas' compensated summation
+    avg_amount = pd.Series(abs_amounts).groupby(group_ids).mean().to_numpy()
+    avg_day = outflows["day"].reset_index(drop=True).groupby(group_ids).mean().to_numpy()
+
+    # Distinct months per group = number of distinct (group, month) pairs
+    month_codes = outflows["month_code"].to_numpy(dtype=np.int64)
+    month_offsets = month_codes - month_codes.min()
+    month_span = int(month_offsets.max()) + 1
+    group_months = np.unique(group_ids * month_span + month_offsets)
+    month_count = np.bincount(group_months // month_span, minlength=n_groups)
+
+    keep = (month_count >= RECURRING_MIN_MONTHS) & (tx_count >= RECURRING_MIN_TX)
+    kept_keys = group_keys[keep]
+    recurring = pd.DataFrame({
+        "merchant_norm": np.asarray(merchants.cat.categories, dtype=object)[kept_keys // amount_span],
+        "rounded_amount": np.asarray(amount_values, dtype=np.float64)[kept_keys % amount_span],
+        "tx_count": tx_count[keep],
+        "month_count": month_count[keep],
+        "avg_amount": avg_amount[keep],
+        "avg_day": avg_day[keep],
+    })
 
     # Micro + macro categories
-    recurring["category"] = recurring["merchant_norm"].apply(infer_category)
-    recurring["macro_category"] = recurring["category"].map(
-        lambda x: MACRO_CATEGORY_MAP.get(x, "Lifestyle")  # default to Lifestyle if unknown
+    recurring["category"] = infer_categories(recurring["merchant_norm"])
+    recurring["macro_category"] = (
+        recurring["category"].map(MACRO_CATEGORY_MAP).fillna("Lifestyle")  # default to Lifestyle if unknown
     )
 
     # Estimated monthly cost = (avg_amount * tx_count) / months_it_appeared
@@ -327,17 +513,17 @@ def detect_recurring_expenses(data: pd.DataFrame) -> List[Dict[str, Any]]:
 
     # Convert to plain dicts
     records: List[Dict[str, Any]] = []
-    for _, row in recurring.iterrows():
+    for row in recurring.itertuples(index=False):
         records.append({
-            "merchant": row["merchant_norm"],
-            "rounded_amount": float(row["rounded_amount"]),
-            "tx_count": int(row["tx_count"]),
-            "month_count": int(row["month_count"]),
-            "avg_amount": float(row["avg_amount"]),
-            "avg_day": float(row["avg_day"]),
-            "category": row["category"],
-            "macro_category": row["macro_category"],
-            "estimated_monthly_cost": float(row["estimated_monthly_cost"]),
+            "merchant": row.merchant_norm,
+            "rounded_amount": float(row.rounded_amount),
+            "tx_count": int(row.tx_count),
+            "month_count": int(row.month_count),
+            "avg_amount": float(row.avg_amount),
+            "avg_day": float(row.avg_day),
+            "category": row.category,
+            "macro_category": row.macro_category,
+            "estimated_monthly_cost": float(row.estimated_monthly_cost),
         })
 
     return records
@@ -348,19 +534,20 @@ def summarise_income_sources(data: pd.DataFrame, employer_keyword: str = "") ->
     Group and classify income sources (salary vs side gigs etc.).
     Uses employer_keyword to recognise the main salary stream.
     """
-    inflows = data[data["is_inflow"]].copy()
+    # Drop internal transfers as an "income source"
+    inflows = data.loc[
+        (data["amount"] > 0) & ~data["is_internal"],
+        ["merchant_norm", "month_code", "amount"],
+    ]
     if inflows.empty:
         return {"sources": [], "total_avg_monthly_income": 0.0}
 
-    # Drop internal transfers as an "income source"
-    inflows = inflows[~inflows["merchant_norm"].apply(is_internal_transfer)]
-
     grouped = (
         inflows
-        .groupby("merchant_norm")
+        .groupby("merchant_norm", observed=True)
         .agg(
             tx_count=("amount", "count"),
-            month_count=("month_key", pd.Series.nunique),
+            month_count=("month_code", "nunique"),
             total_amount=("amount", "sum"),
             avg_amount=("amount", "mean"),
         )
@@ -369,41 +556,42 @@ def summarise_income_sources(data: pd.DataFrame, employer_keyword: str = "") ->
 
     employer_keyword = employer_keyword.upper().strip()
 
-    def classify_income(row):
-        name = row["merchant_norm"]
-
-        # If employer keyword appears, treat as salary
-        if employer_keyword and employer_keyword in name:
-            return "Salary"
+    name = grouped["merchant_norm"]
 
-        # Normal salary heuristics
-        if (
-            ("DIRECT CREDIT" in name or "PAYROLL" in name or "SALARY" in name)
-            and row["month_count"] >= 2
-            and row["tx_count"] >= 2
-            and row["total_amount"] >= 3000
-        ):
-            return "Salary"
-
-        if row["avg_amount"] < 1000 and row["tx_count"] >= 1:
-            return "Side gig / Misc"
+    # If employer keyword appears, treat as salary
+    if employer_keyword:
+        is_employer = name.str.contains(employer_keyword, regex=False)
+    else:
+        is_employer = pd.Series(False, index=grouped.index)
+
+    # Normal salary heuristics
+    is_salary = (
+        name.str.contains("DIRECT CREDIT|PAYROLL|SALARY", regex=True)
+        & (grouped["month_count"] >= 2)
+        & (grouped["tx_count"] >= 2)
+        & (grouped["total_amount"] >= 3000)
+    )
 
-        return "Other income"
+    is_side_gig = (grouped["avg_amount"] < 1000) & (grouped["tx_count"] >= 1)
 
-    grouped["income_type"] = grouped.apply(classify_income, axis=1)
+    grouped["income_type"] = np.select(
+        [is_employer, is_salary, is_side_gig],
+        ["Salary", "Salary", "Side gig / Misc"],
+        default="Other income",
+    )
 
     # Compute per-source avg monthly income
     sources: List[Dict[str, Any]] = []
-    for _, row in grouped.iterrows():
-        monthly_amount = float(row["total_amount"]) / max(int(row["month_count"]), 1)
+    for row in grouped.itertuples(index=False):
+        monthly_amount = float(row.total_amount) / max(int(row.month_count), 1)
         sources.append({
-            "merchant": row["merchant_norm"],
-            "tx_count": int(row["tx_count"]),
-            "month_count": int(row["month_count"]),
-            "total_amount": float(row["total_amount"]),
-            "avg_amount": float(row["avg_amount"]),
+            "merchant": row.merchant_norm,
+            "tx_count": int(row.tx_count),
+            "month_count": int(row.month_count),
+            "total_amount": float(row.total_amount),
+            "avg_amount": float(row.avg_amount),
             "avg_monthly_amount": monthly_amount,
-            "income_type": row["income_type"],
+            "income_type": row.income_type,
             "macro_category": "Income",
         })
 
@@ -415,11 +603,11 @@ def summarise_income_sources(data: pd.DataFrame, employer_keyword: str = "") ->
     }
 
 
-def summarise_expenses(data: pd.DataFrame, recurring_expenses: List[Dict[str, Any]]) -> Dict[str, Any]:
+def summarise_expenses(outflows: pd.DataFrame, recurring_expenses: List[Dict[str, Any]]) -> Dict[str, Any]:
     """
     Summarise expenses into macro/micro categories + leakage hotspots.
+    Expects the external outflows from select_expense_outflows.
     """
-    outflows = data[data["is_outflow"]].copy()
     if outflows.empty:
         return {
             "by_macro_category": [],
@@ -429,54 +617,62 @@ def summarise_expenses(data: pd.DataFrame, recurring_expenses: List[Dict[str, An
             "leakage_hotspots": [],
         }
 
-    # Remove internal transfers from expenses
-    outflows = outflows[~outflows["merchant_norm"].apply(is_internal_transfer)]
+    outflows = outflows.assign(category=infer_categories(outflows["merchant_norm"]))
 
-    outflows["category"] = outflows["merchant_norm"].apply(infer_category)
-    outflows["macro_category"] = outflows["category"].map(
-        lambda x: MACRO_CATEGORY_MAP.get(x, "Unknown")
+    # Single pass over the outflows: spend per (category, month). The micro and
+    # macro rollups below only re-aggregate this small table.
+    cat_month = (
+        outflows
+        .groupby(["category", "month_code"], as_index=False, observed=True)["abs_amount"]
+        .sum()
+    )
+    cat_month["macro_category"] = (
+        cat_month["category"].map(MACRO_CATEGORY_MAP).fillna("Unknown").astype("category")
     )
 
     # Sum by macro category
     macro_group = (
-        outflows
-        .groupby("macro_category")
+        cat_month
+        .groupby(["macro_category", "month_code"], as_index=False, observed=True)["abs_amount"]
+        .sum()
+        .groupby("macro_category", observed=True)
         .agg(
             total_spend=("abs_amount", "sum"),
-            month_count=("month_key", pd.Series.nunique),
+            month_count=("month_code", "size"),
         )
         .reset_index()
     )
 
     macro_records: List[Dict[str, Any]] = []
-    for _, row in macro_group.iterrows():
-        avg_monthly = float(row["total_spend"]) / max(int(row["month_count"]), 1)
+    for row in macro_group.itertuples(index=False):
+        avg_monthly = float(row.total_spend) / max(int(row.month_count), 1)
         macro_records.append({
-            "macro_category": row["macro_category"],
-            "total_spend": float(row["total_spend"]),
-            "month_count": int(row["month_count"]),
+            "macro_category": row.macro_category,
+            "total_spend": float(row.total_spend),
+            "month_count": int(row.month_count),
             "avg_monthly_spend": avg_monthly,
         })
 
     # Sum by micro category
     cat_group = (
-        outflows
-        .groupby("category")
+        cat_month
+        .groupby("category", observed=True)
         .agg(
+            macro_category=("macro_category", "first"),
             total_spend=("abs_amount", "sum"),
-            month_count=("month_key", pd.Series.nunique),
+            month_count=("month_code", "size"),
         )
         .reset_index()
     )
 
     cat_records: List[Dict[str, Any]] = []
-    for _, row in cat_group.iterrows():
-        avg_monthly = float(row["total_spend"]) / max(int(row["month_count"]), 1)
+    for row in cat_group.itertuples(index=False):
+        avg_monthly = float(row.total_spend) / max(int(row.month_count), 1)
         cat_records.append({
-            "category": row["category"],
-            "macro_category": MACRO_CATEGORY_MAP.get(row["category"], "Unknown"),
-            "total_spend": float(row["total_spend"]),
-            "month_count": int(row["month_count"]),
+            "category": row.category,
+            "macro_category": row.macro_category,
+            "total_spend": float(row.total_spend),
+            "month_count": int(row.month_count),
             "avg_monthly_spend": avg_monthly,
         })
 
@@ -504,26 +700,129 @@ def summarise_expenses(data: pd.DataFrame, recurring_expenses: List[Dict[str, An
     }
 
 
-def analyse_bank_statements(files: List[str], employer_keyword: str = "") -> Dict[str, Any]:
+def _hash_file(h: Any, path: Path) -> None:
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b""):
+            h.update(block)
+
+
+def _cache_key(files: List[str], employer_keyword: str) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    # The analyzer's own source stands in for a version: any logic change
+    # produces new keys, so stale results are never served.
+    _hash_file(h, Path(__file__))
+    for file_path in files:
+        path = Path(file_path)
+        h.update(path.stat().st_size.to_bytes(8, "little"))
+        _hash_file(h, path)
+    h.update(employer_keyword.encode())
+    return h.hexdigest()
+
+
+def _is_expired(path: Path, now: float) -> bool:
+    return now - path.stat().st_mtime > CACHE_TTL_SECONDS
+
+
+def _read_cached_analysis(cache_path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        if _is_expired(cache_path, time.time()):
+            cache_path.unlink()
+            return None
+        return json.loads(cache_path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def _prune_cache(cache_dir: Path) -> None:
+    """Drop expired entries, then the oldest ones beyond CACHE_MAX_ENTRIES."""
+    now = time.time()
+    entries = []
+    for path in cache_dir.glob("*.json"):
+        try:
+            if _is_expired(path, now):
+                path.unlink()
+            else:
+                entries.append((path.stat().st_mtime, path))
+        except OSError:
+            continue
+    entries.sort(reverse=True)
+    for _, path in entries[CACHE_MAX_ENTRIES:]:
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+
+def _write_cached_analysis(cache_path: Path, result: Dict[str, Any]) -> None:
+    """Atomically write the result; an unwritable cache dir is not an error."""
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=cache_path.parent, prefix=cache_path.name, suffix=".tmp")
+    except OSError:
+        return
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(result, f)
+        os.replace(tmp_name, cache_path)
+    except OSError:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        return
+    _prune_cache(cache_path.parent)
+
+
+def analyse_bank_statements(
+    files: List[str],
+    employer_keyword: str = "",
+    cache_dir: Optional[Path] = None,
+) -> Dict[str, Any]:
     """
     Main entry: analyse the provided CSV files and return
     a frontend-friendly JSON structure.
+
+    If cache_dir is given, results are memoised there for CACHE_TTL_SECONDS,
+    keyed by the file contents and employer_keyword. Off by default.
     """
+    if cache_dir is None:
+        return _analyse_bank_statements(files, employer_keyword)
+
+    try:
+        key = _cache_key(files, employer_keyword)
+    except OSError:
+        # Let the loader report missing/unreadable files
+        return _analyse_bank_statements(files, employer_keyword)
+
+    cache_path = Path(cache_dir) / f"{key}.json"
+    cached = _read_cached_analysis(cache_path)
+    if cached is not None:
+        return cached
+
+    result = _analyse_bank_statements(files, employer_keyword)
+    _write_cached_analysis(cache_path, result)
+    return result
+
+
+def _analyse_bank_statements(files: List[str], employer_keyword: str) -> Dict[str, Any]:
     data = load_statements_from_files(files)
 
+    outflows = select_expense_outflows(data)
+
     monthly_summary = compute_monthly_summary(data)
-    recurring_expenses = detect_recurring_expenses(data)
+    recurring_expenses = detect_recurring_expenses(outflows)
     income_summary = summarise_income_sources(data, employer_keyword)
-    expense_summary = summarise_expenses(data, recurring_expenses)
+    expense_summary = summarise_expenses(outflows, recurring_expenses)
 
+    amounts = data["amount"].to_numpy()
     months = sorted(data["month_key"].unique())
     start_date = data["date"].min()
     end_date = data["date"].max()
 
     overall = {
         "total_transactions": int(len(data)),
-        "total_inflow_transactions": int(data["is_inflow"].sum()),
-        "total_outflow_transactions": int(data["is_outflow"].sum()),
+        "total_inflow_transactions": int((amounts > 0).sum()),
+        "total_outflow_transactions": int((amounts < 0).sum()),
         "months_covered": months,
         "start_date": start_date.strftime("%Y-%m-%d"),
         "end_date": end_date.strftime("%Y-%m-%d"),
@@ -566,10 +865,22 @@ def main():
         default="-",
         help="Output path for JSON (default: stdout). Use '-' for stdout.",
     )
+    parser.add_argument(
+        "--cache-dir",
+        default=os.environ.get(CACHE_DIR_ENV) or None,
+        help=(
+            f"Opt-in directory for caching results for {CACHE_TTL_SECONDS // 60} minutes "
+            f"(default: ${CACHE_DIR_ENV}, otherwise no caching)."
+        ),
+    )
     args = parser.parse_args()
 
     file_list = [str(Path(p).expanduser()) for p in args.files][:3]
-    summary = analyse_bank_statements(file_list, employer_keyword=args.employer)
+    summary = analyse_bank_statements(
+        file_list,
+        employer_keyword=args.employer,
+        cache_dir=Path(args.cache_dir).expanduser() if args.cache_dir else None,
+    )
     output_json = json.dumps(summary, indent=2)
 
     if args.output == "-" or args.output.lower() == "stdout":